@@ -21,10 +21,18 @@ GEMINI_TEMPERATURE = 0
 # When True: no Gemini API calls; return deterministic mock JSON (full pipeline testing without billing)
 DRY_RUN = os.getenv("DRY_RUN", "").strip().lower() in ("true", "1", "yes")
 
-# Rate limit: min seconds between Gemini requests (global)
+# When True: long notes are trimmed to diabetes/BP-relevant lines + whole medication sections before extraction
+# (src/tasks.py). Set TRIM_NOTES=false to always send the full note.
+TRIM_NOTES = os.getenv("TRIM_NOTES", "true").strip().lower() in ("true", "1", "yes")
+
+# Rate limit: min seconds between Gemini request starts, shared by all agents and threads (src/rate_limit.py)
 RATE_LIMIT_SEC = 2
 # Max retries on 429 when retry_after is present (quota > 0). No retry when free-tier quota is 0.
 MAX_429_RETRIES = 2
+# Max notes in flight at once in the async CLI pipeline (src/main.py); every Gemini call still waits on RATE_LIMIT_SEC
+MAX_CONCURRENCY = max(1, int(os.getenv("MAX_CONCURRENCY", "4")))
+# Gemini Batch API (src/main.py --batch): seconds between job status polls
+BATCH_POLL_SEC = 30
 
 DATA_DIR = PROJECT_ROOT / "data"
 FILTERED_NOTES_PATH = DATA_DIR / "filtered_discharge_notes.csv"
@@ -102,6 +102,7 @@ STYLE: Short clinical sentences. No emojis. No markdown. No extra keys. No expla
 RISK_ANALYZER_BACKSTORY = "You analyze extraction JSON only. You do not extract or modify source data. You output one JSON object with summary, risk insights, evidence, and confidence."
 
 
+@lru_cache(maxsize=1)
 def get_risk_analyzer_agent() -> Agent:
     """Build Agent 2: Risk & Insight Analyzer (consumes Agent 1 JSON)."""
     validate_settings()
@@ -0,0 +1,144 @@
+"""
+Bulk extraction (Agent 1) through the Gemini Batch API instead of one online call per note.
+Builds one JSONL request per in-scope note, uploads it as a batch job, polls until the job finishes,
+then runs the usual parse/normalize/repair path on each response. Batch jobs are billed at a discount
+and are not subject to the per-minute request quota, so large filtered note files finish sooner.
+
+Output matches run_extraction: one schema dict per input row, in input order; failures yield error payloads.
+"""
+
+import json
+import logging
+import tempfile
+import time
+from pathlib import Path
+from typing import Any
+
+from config.settings import BATCH_POLL_SEC, DRY_RUN, GEMINI_API_KEY, GEMINI_MODEL, validate_settings
+from src.agents import EXTRACTOR_GOAL
+from src.extraction import _empty_schema, _error_payload, _finalize_output, _mock_extraction, _note_has_scope
+from src.tasks import extraction_prompt
+
+logger = logging.getLogger(__name__)
+
+JOB_DONE_STATES = frozenset({
+    "JOB_STATE_SUCCEEDED",
+    "JOB_STATE_PARTIALLY_SUCCEEDED",
+    "JOB_STATE_FAILED",
+    "JOB_STATE_CANCELLED",
+    "JOB_STATE_EXPIRED",
+})
+JOB_OK_STATES = frozenset({"JOB_STATE_SUCCEEDED", "JOB_STATE_PARTIALLY_SUCCEEDED"})
+
+
+def _batch_model_name() -> str:
+    """Gemini model id for the Batch API (CrewAI accepts a provider prefix, the API does not)."""
+    return GEMINI_MODEL.removeprefix("gemini/").removeprefix("models/")
+
+
+def _build_request_line(key: str, note_text: str) -> str:
+    """One JSONL line: extractor system prompt + extraction instructions for one note, temperature 0."""
+    return json.dumps({
+        "key": key,
+        "request": {
+            "system_instruction": {"parts": [{"text": EXTRACTOR_GOAL}]},
+            "contents": [{"role": "user", "parts": [{"text": extraction_prompt(note_text)}]}],
+            "generation_config": {"temperature": 0},
+        },
+    }, ensure_ascii=False)
+
+
+def _response_text(line: dict[str, Any]) -> str | None:
+    """Concatenated text parts of the first candidate; None if the line carries an error or no text."""
+    if line.get("error"):
+        return None
+    candidates = (line.get("response") or {}).get("candidates") or []
+    if not candidates:
+        return None
+    parts = (candidates[0].get("content") or {}).get("parts") or []
+    text = "".join(p.get("text", "") for p in parts if isinstance(p, dict))
+    return text or None
+
+
+def _submit_and_wait(client: Any, jsonl_path: Path) -> Any:
+    """Upload the JSONL file, create the batch job and poll until it reaches a terminal state."""
+    uploaded = client.files.upload(
+        file=str(jsonl_path),
+        config={"display_name": jsonl_path.name, "mime_type": "jsonl"},
+    )
+    job = client.batches.create(
+        model=_batch_model_name(),
+        src=uploaded.name,
+        config={"display_name": "clinical-extraction"},
+    )
+    logger.info("Batch job %s created (%s)", job.name, _batch_model_name())
+    while True:
+        job = client.batches.get(name=job.name)
+        state = getattr(job.state, "name", str(job.state))
+        if state in JOB_DONE_STATES:
+            logger.info("Batch job %s finished: %s", job.name, state)
+            return job
+        logger.info("Batch job %s: %s; next poll in %ds", job.name, state, BATCH_POLL_SEC)
+        time.sleep(BATCH_POLL_SEC)
+
+
+def run_extraction_batch(rows: list[tuple[str, str]]) -> list[dict[str, Any]]:
+    """
+    Extract all (patient_id, note_text) rows with one Gemini batch job.
+    Out-of-scope notes get the empty schema without being submitted (same gate as run_extraction).
+    """
+    if DRY_RUN:
+        logger.info("DRY_RUN: %d notes -> mock extraction (no batch job)", len(rows))
+        return [_mock_extraction(pid) for pid, _ in rows]
+
+    results: list[dict[str, Any] | None] = [None] * len(rows)
+    lines: list[str] = []
+    for i, (patient_id, note_text) in enumerate(rows):
+        if _note_has_scope(note_text):
+            lines.append(_build_request_line(str(i), note_text))
+        else:
+            results[i] = _empty_schema(patient_id)
+    if not lines:
+        return results
+
+    validate_settings()
+    from google import genai
+
+    client = genai.Client(api_key=GEMINI_API_KEY)
+    with tempfile.TemporaryDirectory() as tmp:
+        jsonl_path = Path(tmp) / "extraction_requests.jsonl"
+        jsonl_path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+        job = _submit_and_wait(client, jsonl_path)
+
+    state = getattr(job.state, "name", str(job.state))
+    dest_file = getattr(job.dest, "file_name", None) if job.dest else None
+    if state not in JOB_OK_STATES or not dest_file:
+        message = f"Gemini batch job {state}: {job.error or 'no output file'}"
+        logger.error(message)
+        return [r if r is not None else _error_payload(pid, message) for r, (pid, _) in zip(results, rows)]
+
+    output = client.files.download(file=dest_file).decode("utf-8")
+    for raw_line in output.splitlines():
+        if not raw_line.strip():
+            continue
+        try:
+            line = json.loads(raw_line)
+            i = int(line["key"])
+        except (json.JSONDecodeError, KeyError, TypeError, ValueError):
+            logger.warning("Skipping unreadable batch output line: %.200s", raw_line)
+            continue
+        if not 0 <= i < len(rows):
+            logger.warning("Skipping batch output line with unknown key %r", line["key"])
+            continue
+        patient_id = rows[i][0]
+        text = _response_text(line)
+        if text is None:
+            logger.error("patient_id=%s batch request failed: %s", patient_id, line.get("error"))
+            results[i] = _error_payload(patient_id, f"Batch request failed: {line.get('error') or 'empty response'}")
+        else:
+            results[i] = _finalize_output(text, patient_id)
+
+    return [
+        r if r is not None else _error_payload(pid, "No response in batch output.")
+        for r, (pid, _) in zip(results, rows)
+    ]
@@ -1,19 +1,38 @@
 """
 Production-grade filter for MIMIC-IV discharge notes.
 Streams discharge.csv.gz in chunks and writes rows matching clinical keywords
-to filtered_discharge_notes.csv.
+(note id, patient ids, charttime, text) to filtered_discharge_notes.csv.
 """
 
 import logging
+import re
 import sys
 from pathlib import Path
 
 import pandas as pd
 
+# pyarrow's CSV writer serializes matched chunks in C; without it, fall back to pandas to_csv on one open handle
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pcsv
+except ImportError:
+    pa = pcsv = None
+
+# ISA-L's igzip decompresses much faster than stdlib gzip; same open() API, so fall back transparently
+try:
+    from isal import igzip as gzip_reader
+except ImportError:
+    import gzip as gzip_reader
+
 # Keywords to match (case-insensitive) in the text column
 KEYWORDS = ("diabetes", "hypertension", "a1c")
+KW_RE = re.compile("|".join(re.escape(kw) for kw in KEYWORDS), re.IGNORECASE)
 CHUNK_SIZE = 10_000
-COMPRESSION = "gzip"
+# Columns carried into the filtered CSV (main.py needs the id columns + text); others are never parsed
+USECOLS = ("note_id", "subject_id", "hadm_id", "charttime", "text")
+# Arrow-backed text: str.contains runs in Arrow's native regex engine. Pinned explicitly so the
+# pandas major version (plain "string" is Arrow-backed only on some) does not pick the scan path.
+TEXT_DTYPE = "string[pyarrow]" if pa is not None else "string[python]"
 
 # Paths relative to project root
 PROJECT_ROOT = Path(__file__).resolve().parent.parent
@@ -37,65 +56,85 @@ def _ensure_text_column(df: pd.DataFrame) -> None:
         )
 
 
-def _text_matches(row_text: str) -> bool:
-    """Return True if row text contains any keyword (case-insensitive)."""
-    if pd.isna(row_text):
-        return False
-    lower = str(row_text).lower()
-    return any(kw in lower for kw in KEYWORDS)
+def _keyword_mask(texts: pd.Series) -> pd.Series:
+    """True where text contains any keyword (case-insensitive); missing text never matches."""
+    return texts.str.contains(KW_RE, na=False)
+
+
+def _as_string_table(df: pd.DataFrame) -> "pa.Table":
+    """
+    Arrow table with every column as string, so all chunks share one writer schema
+    (per-chunk type inference differs, e.g. an id column that is all-null in one chunk).
+    """
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    return table.cast(pa.schema([(name, pa.string()) for name in table.column_names]))
 
 
 def run_filter() -> None:
     """
-    Stream discharge.csv.gz in chunks, filter by keywords, append matches to CSV.
-    Creates output file if it does not exist; preserves all original columns.
+    Stream discharge.csv.gz in chunks, filter by keywords, stream matches to CSV through one pyarrow writer
+    (or one open file handle for pandas to_csv without pyarrow).
+    Truncates the output file up front (empty if nothing matches); keeps only the USECOLS columns present in the input.
     """
     if not INPUT_PATH.exists():
         raise FileNotFoundError(f"Input file not found: {INPUT_PATH}")
 
     OUTPUT_PATH.parent.mkdir(parents=True, exist_ok=True)
+    # Truncate now: the writer opens lazily on the first match, so a run with no matches must not leave old rows
+    OUTPUT_PATH.write_bytes(b"")
 
     total_scanned = 0
     total_matched = 0
     chunk_number = 0
-    write_header = True
-
-    logger.info("Starting filtered read from %s", INPUT_PATH)
-
-    for chunk in pd.read_csv(
-        INPUT_PATH,
-        compression=COMPRESSION,
-        chunksize=CHUNK_SIZE,
-        low_memory=False,
-    ):
-        chunk_number += 1
-        _ensure_text_column(chunk)
-
-        scanned = len(chunk)
-        total_scanned += scanned
-
-        mask = chunk["text"].apply(_text_matches)
-        matched_chunk = chunk.loc[mask]
-        matched_count = len(matched_chunk)
-        total_matched += matched_count
-
-        logger.info(
-            "Chunk %d | Rows scanned: %d | Rows matched: %d | Total scanned: %d | Total matched: %d",
-            chunk_number,
-            scanned,
-            matched_count,
-            total_scanned,
-            total_matched,
-        )
-
-        if matched_count > 0:
-            matched_chunk.to_csv(
-                OUTPUT_PATH,
-                mode="w" if write_header else "a",
-                header=write_header,
-                index=False,
-            )
-            write_header = False
+    writer = None  # pyarrow CSVWriter, opened on the first matched chunk
+    out_fh = None  # pandas fallback: one binary handle kept open across chunks
+
+    logger.info("Starting filtered read from %s (decompressor: %s)", INPUT_PATH, gzip_reader.__name__)
+
+    try:
+        with gzip_reader.open(INPUT_PATH, "rb") as fh:
+            for chunk in pd.read_csv(
+                fh,
+                usecols=lambda col: col in USECOLS,
+                dtype={"text": TEXT_DTYPE},
+                chunksize=CHUNK_SIZE,
+                low_memory=False,
+            ):
+                chunk_number += 1
+                _ensure_text_column(chunk)
+
+                scanned = len(chunk)
+                total_scanned += scanned
+
+                mask = _keyword_mask(chunk["text"])
+                matched_chunk = chunk.loc[mask]
+                matched_count = len(matched_chunk)
+                total_matched += matched_count
+
+                logger.info(
+                    "Chunk %d | Rows scanned: %d | Rows matched: %d | Total scanned: %d | Total matched: %d",
+                    chunk_number,
+                    scanned,
+                    matched_count,
+                    total_scanned,
+                    total_matched,
+                )
+
+                if matched_count > 0 and pcsv is not None:
+                    table = _as_string_table(matched_chunk)
+                    if writer is None:
+                        writer = pcsv.CSVWriter(OUTPUT_PATH, table.schema)
+                    writer.write_table(table)
+                elif matched_count > 0:
+                    write_header = out_fh is None
+                    if out_fh is None:
+                        out_fh = open(OUTPUT_PATH, "wb")
+                    matched_chunk.to_csv(out_fh, header=write_header, index=False)
+    finally:
+        if writer is not None:
+            writer.close()
+        if out_fh is not None:
+            out_fh.close()
 
     logger.info(
         "Finished. Total rows scanned: %d, total rows matched: %d, output: %s",
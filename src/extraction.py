@@ -40,27 +40,33 @@ AFTER (post-processor):
 (Diabetes labs/meds cleared because type and status empty; BP readings filtered to SYS/DIA only; meds lowercased; arrays sorted.)
 """
 
+import asyncio
 import json
 import logging
 import random
 import re
+import threading
 import time
 from typing import Any
 
-from crewai import Crew
+from crewai import Crew, Task
 
 from config.schema import (
     REQUIRED_BP_KEYS,
     REQUIRED_DIABETES_KEYS,
     REQUIRED_TOP_KEYS,
 )
-from config.settings import DRY_RUN, MAX_429_RETRIES, RATE_LIMIT_SEC
+from config.settings import DRY_RUN, MAX_429_RETRIES
+from src.rate_limit import rate_limit, rate_limit_async
 from src.tasks import extraction_task, repair_json_task
 
 logger = logging.getLogger(__name__)
 
 RETRY_AFTER_PATTERN = re.compile(r"[Rr]etry in (\d+(?:\.\d+)?)\s*s", re.IGNORECASE)
+# 429 / quota errors: one case-insensitive scan instead of three substring checks + lower()
+QUOTA_PATTERN = re.compile(r"429|RESOURCE_EXHAUSTED|quota", re.IGNORECASE)
 JSON_BLOCK_PATTERN = re.compile(r"```(?:json)?\s*([\s\S]*?)\s*```|(\{[\s\S]*\})")
+_JSON_DECODER = json.JSONDecoder()
 TRAILING_COMMA_PATTERN = re.compile(r",\s*([}\]])")
 COMMENT_PATTERN = re.compile(r'//[^\n]*|#[^\n]*')
 # bp_readings: extract pure SYS/DIA (strip "BP=", units, text)
@@ -81,7 +87,8 @@ ABNORMAL_MARKER_BLOCKLIST = frozenset(
     )
 )
 
-_last_request_time: float = 0.0
+# Per-thread reusable Crews, one per agent (see _agent_crew)
+_crew_local = threading.local()
 
 # Hard-scope gate: if note contains none of these, skip LLM and return empty schema
 SCOPE_DIABETES_PHRASES = ("diabetes", "diabetes mellitus")
@@ -98,14 +105,6 @@ def _note_has_scope(note_text: str) -> bool:
     return False
 
 
-def _rate_limit() -> None:
-    global _last_request_time
-    now = time.monotonic()
-    if now - _last_request_time < RATE_LIMIT_SEC:
-        time.sleep(RATE_LIMIT_SEC - (now - _last_request_time))
-    _last_request_time = time.monotonic()
-
-
 def _mock_extraction(patient_id: str) -> dict[str, Any]:
     return {
         "patient_id": patient_id,
@@ -125,10 +124,29 @@ def _mock_extraction(patient_id: str) -> dict[str, Any]:
     }
 
 
+def _decode_first_object(text: str) -> Any:
+    """Decode the JSON object starting at the first '{' (ignores surrounding prose/fences). None if it is not valid JSON."""
+    idx = (text or "").find("{")
+    if idx < 0:
+        return None
+    try:
+        obj, _ = _JSON_DECODER.raw_decode(text, idx)
+    except json.JSONDecodeError:
+        return None
+    return obj
+
+
 def _extract_raw_json(text: str) -> str:
     text = (text or "").strip()
     if text.startswith("{") and text.endswith("}"):
         return text
+    idx = text.find("{")
+    if idx >= 0:
+        try:
+            _, end = _JSON_DECODER.raw_decode(text, idx)
+            return text[idx:end]
+        except json.JSONDecodeError:
+            pass
     for match in JSON_BLOCK_PATTERN.finditer(text):
         group = match.group(1) or match.group(2)
         if group and group.strip().startswith("{"):
@@ -143,13 +161,35 @@ def _repair_json_string(s: str) -> str:
     return s
 
 
+def _agent_crew(task: Task) -> Crew:
+    """
+    This thread's Crew for task.agent (a cached agent from src.agents) with `task` swapped in.
+    Built once per thread and agent (Crew setup and Crew.copy() are not free) from a copy of the cached
+    Agent: the Agent keeps per-run executor state, so threads must not share it.
+    """
+    crews = getattr(_crew_local, "crews", None)
+    if crews is None:
+        crews = _crew_local.crews = {}
+    role = task.agent.role
+    crew = crews.get(role)
+    if crew is None:
+        crew = Crew(agents=[task.agent], tasks=[task], memory=False, cache=False).copy()
+        crews[role] = crew
+        return crew
+    task.agent = crew.agents[0]
+    crew.tasks = [task]
+    return crew
+
+
+def _kickoff(task: Task) -> str:
+    """Run one agent task on this thread's Crew for that agent. Returns raw output string."""
+    result = _agent_crew(task).kickoff()
+    return getattr(result, "raw", None) or str(result)
+
+
 def _run_repair_once(broken_json: str) -> str:
     """Call LLM once to fix invalid JSON. Returns raw output string."""
-    task = repair_json_task(broken_json)
-    agent = task.agent
-    crew = Crew(agents=[agent], tasks=[task], memory=False, cache=False)
-    result = crew.kickoff()
-    return getattr(result, "raw", None) or str(result)
+    return _kickoff(repair_json_task(broken_json))
 
 
 def _ensure_dict(obj: Any) -> dict[str, Any]:
@@ -379,8 +419,7 @@ def _error_payload(patient_id: str, message: str) -> dict[str, Any]:
 
 
 def _is_429(err: Exception) -> bool:
-    s = str(err)
-    return "429" in s or "RESOURCE_EXHAUSTED" in s or "quota" in s.lower()
+    return bool(QUOTA_PATTERN.search(str(err)))
 
 
 def _has_retry_after(err: Exception) -> bool:
@@ -392,16 +431,18 @@ def _parse_and_normalize(raw_json_str: str, patient_id: str) -> dict[str, Any] |
     Parse JSON (with optional string repair), force defaults, inject patient_id, apply schema filters, dedupe medications.
     Returns None if parsing fails (caller should not crash).
     """
-    s = _extract_raw_json(raw_json_str)
-    obj: dict[str, Any] | None = None
-    try:
-        obj = json.loads(s)
-    except json.JSONDecodeError:
-        s = _repair_json_string(s)
+    # Fast path: well-formed object (possibly wrapped in prose/fences) decoded once, no regex scan
+    obj: dict[str, Any] | None = _decode_first_object(raw_json_str)
+    if obj is None:
+        s = _extract_raw_json(raw_json_str)
         try:
             obj = json.loads(s)
         except json.JSONDecodeError:
-            return None
+            s = _repair_json_string(s)
+            try:
+                obj = json.loads(s)
+            except json.JSONDecodeError:
+                return None
     if not isinstance(obj, dict):
         return None
     _force_empty_defaults(obj)
@@ -430,6 +471,51 @@ def _parse_and_normalize(raw_json_str: str, patient_id: str) -> dict[str, Any] |
     return _schema_validate_final(obj)
 
 
+def _429_backoff(err: Exception, attempt: int, patient_id: str) -> tuple[float, dict[str, Any] | None]:
+    """
+    Decide how to handle a failed kickoff. Non-429 errors are re-raised. Returns (wait_sec, None) to retry,
+    or (0, error_payload) when quota is exhausted or retries are used up.
+    """
+    if not _is_429(err):
+        raise err
+    if not _has_retry_after(err):
+        logger.error("Gemini free-tier quota exhausted. patient_id=%s", patient_id)
+        return 0.0, _error_payload(patient_id, "Gemini free-tier quota exhausted. Enable billing or use DRY_RUN.")
+    if attempt >= MAX_429_RETRIES:
+        logger.error("Gemini 429 after %d retries. patient_id=%s", MAX_429_RETRIES, patient_id)
+        return 0.0, _error_payload(patient_id, f"Resource exhausted (429) after {MAX_429_RETRIES} retries.")
+    match = RETRY_AFTER_PATTERN.search(str(err))
+    base_wait = float(match.group(1)) if match else 30.0
+    base_wait = min(base_wait, 120.0)
+    wait_sec = min(base_wait * (2**attempt) + random.uniform(0, 2.0), 120.0)
+    logger.warning("Gemini 429, retry %d/%d in %.0fs. patient_id=%s", attempt + 1, MAX_429_RETRIES, wait_sec, patient_id)
+    return wait_sec, None
+
+
+def _finalize_output(raw_output: str, patient_id: str) -> dict[str, Any]:
+    """Parse and normalize raw crew output; LLM repair once on failure; error payload if still invalid."""
+    # First attempt: parse (with string repair) and normalize
+    obj = _parse_and_normalize(raw_output, patient_id)
+
+    # Second attempt: LLM repair once if parse failed
+    if obj is None:
+        json_str = _extract_raw_json(raw_output)
+        logger.warning("JSON parse failed for patient_id=%s; attempting LLM repair once.", patient_id)
+        try:
+            rate_limit()
+            repair_output = _run_repair_once(json_str)
+            obj = _parse_and_normalize(repair_output, patient_id)
+        except Exception as e:
+            logger.error("LLM repair failed for patient_id=%s: %s", patient_id, e)
+            obj = None
+
+    if obj is None:
+        logger.error("Invalid JSON for patient_id=%s after repair; skipping patient (no crash).", patient_id)
+        return _error_payload(patient_id, "Invalid JSON after repair; extraction skipped.")
+
+    return obj
+
+
 def run_extraction(patient_id: str, note_text: str) -> dict[str, Any]:
     """
     Run extractor on one note. Inject patient_id after response. If JSON invalid, try LLM repair once; if still invalid, log and return error payload (do not crash).
@@ -443,59 +529,48 @@ def run_extraction(patient_id: str, note_text: str) -> dict[str, Any]:
         logger.info("patient_id=%s: no diabetes/hypertension in note -> empty schema (no LLM call)", patient_id)
         return _empty_schema(patient_id)
 
-    _rate_limit()
+    rate_limit()
 
     task = extraction_task(patient_id=patient_id, note_text=note_text)
-    agent = task.agent
-    crew = Crew(agents=[agent], tasks=[task], memory=False, cache=False)
 
-    last_429_error: Exception | None = None
     for attempt in range(MAX_429_RETRIES + 1):
         try:
-            result = crew.kickoff()
+            raw_output = _kickoff(task)
             break
         except Exception as e:
-            if not _is_429(e):
-                raise
-            if not _has_retry_after(e):
-                logger.error("Gemini free-tier quota exhausted. patient_id=%s", patient_id)
-                return _error_payload(patient_id, "Gemini free-tier quota exhausted. Enable billing or use DRY_RUN.")
-            if attempt >= MAX_429_RETRIES:
-                logger.error("Gemini 429 after %d retries. patient_id=%s", MAX_429_RETRIES, patient_id)
-                return _error_payload(patient_id, f"Resource exhausted (429) after {MAX_429_RETRIES} retries.")
-            match = RETRY_AFTER_PATTERN.search(str(e))
-            base_wait = float(match.group(1)) if match else 30.0
-            base_wait = min(base_wait, 120.0)
-            wait_sec = min(base_wait * (2**attempt) + random.uniform(0, 2.0), 120.0)
-            logger.warning("Gemini 429, retry %d/%d in %.0fs. patient_id=%s", attempt + 1, MAX_429_RETRIES, wait_sec, patient_id)
+            wait_sec, error = _429_backoff(e, attempt, patient_id)
+            if error is not None:
+                return error
             time.sleep(wait_sec)
-            last_429_error = e
-            continue
-    else:
-        if last_429_error is not None:
-            return _error_payload(patient_id, f"Resource exhausted (429) after {MAX_429_RETRIES} retries.")
-        raise RuntimeError("Unexpected loop exit in run_extraction")
 
-    raw_output = getattr(result, "raw", None) or str(result)
-    json_str = _extract_raw_json(raw_output)
+    return _finalize_output(raw_output, patient_id)
 
-    # First attempt: parse (with string repair) and normalize
-    obj = _parse_and_normalize(json_str, patient_id)
 
-    # Second attempt: LLM repair once if parse failed
-    if obj is None:
-        logger.warning("JSON parse failed for patient_id=%s; attempting LLM repair once.", patient_id)
+async def run_extraction_async(patient_id: str, note_text: str) -> dict[str, Any]:
+    """
+    Async run_extraction for concurrent batches: same gates, 429 backoff and repair, but waits with asyncio.sleep
+    so other notes' Gemini round-trips overlap. Kickoffs run on worker threads, each with its own reusable Crew.
+    """
+    if DRY_RUN:
+        logger.info("DRY_RUN: patient_id=%s -> mock extraction (no API call)", patient_id)
+        return _mock_extraction(patient_id)
+
+    if not _note_has_scope(note_text):
+        logger.info("patient_id=%s: no diabetes/hypertension in note -> empty schema (no LLM call)", patient_id)
+        return _empty_schema(patient_id)
+
+    await rate_limit_async()
+
+    task = extraction_task(patient_id=patient_id, note_text=note_text)
+
+    for attempt in range(MAX_429_RETRIES + 1):
         try:
-            _rate_limit()
-            repair_output = _run_repair_once(json_str)
-            repair_str = _extract_raw_json(repair_output)
-            obj = _parse_and_normalize(repair_str, patient_id)
+            raw_output = await asyncio.to_thread(_kickoff, task)
+            break
         except Exception as e:
-            logger.error("LLM repair failed for patient_id=%s: %s", patient_id, e)
-            obj = None
-
-    if obj is None:
-        logger.error("Invalid JSON for patient_id=%s after repair; skipping patient (no crash).", patient_id)
-        return _error_payload(patient_id, "Invalid JSON after repair; extraction skipped.")
+            wait_sec, error = _429_backoff(e, attempt, patient_id)
+            if error is not None:
+                return error
+            await asyncio.sleep(wait_sec)
 
-    return obj
+    return await asyncio.to_thread(_finalize_output, raw_output, patient_id)
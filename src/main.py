@@ -1,12 +1,17 @@
 """
 Entry point: load filtered_discharge_notes.csv and run the clinical pipeline via the Orchestrator (Agent 5).
 The orchestrator runs Extraction → Risk Analysis → Summary → Visualization for each note.
+
+Usage: python src/main.py [--batch]
+  --batch  extract all notes with one Gemini Batch API job, then run Agents 2-4 per note.
 """
 
+import asyncio
 import json
 import logging
 import sys
 from pathlib import Path
+from typing import Callable
 
 import pandas as pd
 
@@ -15,8 +20,10 @@ _PROJECT_ROOT = Path(__file__).resolve().parent.parent
 if str(_PROJECT_ROOT) not in sys.path:
     sys.path.insert(0, str(_PROJECT_ROOT))
 
-from config.settings import DRY_RUN, FILTERED_NOTES_PATH, validate_settings
-from src.orchestrator import run_pipeline
+from config.settings import DRY_RUN, FILTERED_NOTES_PATH, MAX_CONCURRENCY, validate_settings
+from src.batch_extraction import run_extraction_batch
+from src.extraction import QUOTA_PATTERN
+from src.orchestrator import run_pipeline_async
 from src.validator import empty_schema, validate_extraction_output
 
 logging.basicConfig(
@@ -30,8 +37,7 @@ logger = logging.getLogger(__name__)
 
 def _is_429_error(e: Exception) -> bool:
     """True if exception is 429 / quota (suppress stack trace for expected quota errors)."""
-    s = str(e)
-    return "429" in s or "RESOURCE_EXHAUSTED" in s or "quota" in s.lower()
+    return bool(QUOTA_PATTERN.search(str(e)))
 
 
 def _is_404_model_error(e: Exception) -> bool:
@@ -40,16 +46,124 @@ def _is_404_model_error(e: Exception) -> bool:
     return "404" in s or "NOT_FOUND" in s or "no longer available" in s
 
 MAX_ROWS = 5
+# One extraction JSON object per line, appended as notes finish (read by validate_extraction.py)
+EXTRACTION_RESULTS_PATH = _PROJECT_ROOT / "data" / "extraction_results.ndjson"
 TEXT_COLUMN = "text"
 PATIENT_ID_COLUMNS = ("subject_id", "hadm_id", "patient_id")  # first found wins
 
 
-def _get_patient_id(row: pd.Series, index: int) -> str:
-    """Derive patient_id from row; fallback to row index."""
-    for col in PATIENT_ID_COLUMNS:
-        if col in row.index and pd.notna(row.get(col)):
-            return str(row[col]).strip()
-    return str(index)
+def _get_patient_ids(df: pd.DataFrame) -> list[str]:
+    """Derive patient_id per row (first non-null PATIENT_ID_COLUMNS value); fallback to row index."""
+    ids = pd.Series(df.index.astype(str), index=df.index, dtype=object)
+    for col in reversed(PATIENT_ID_COLUMNS):
+        if col in df.columns:
+            values = df[col]
+            ids = values.astype(str).str.strip().where(values.notna(), ids)
+    return ids.tolist()
+
+
+def _error_result(patient_id: str, e: Exception) -> dict:
+    """Full pipeline-shaped result for a failed note (empty extraction + default downstream outputs)."""
+    error_extraction = validate_extraction_output(
+        {**empty_schema(patient_id), "error": str(e)}, verbose=True
+    )
+    return {
+        "extraction": error_extraction,
+        "risk_analysis": {
+            "summary": "Insufficient data.",
+            "diabetes_risk_insights": [],
+            "hypertension_risk_insights": [],
+            "supporting_evidence": {"labs": [], "vitals": [], "medications": []},
+            "confidence_level": "low",
+        },
+        "summary": {
+            "doctor_summary": "",
+            "patient_summary": "",
+            "key_flags": [],
+            "data_gaps": [],
+        },
+        "visualizations": {
+            "visualizations": {
+                "risk_levels": {"hypertension": "Low", "diabetes": "Low"},
+                "risk_scores": {"hypertension_score": 0.25, "diabetes_score": 0.25},
+                "severity_indicator": {"level": "Low", "color": "green"},
+                "evidence_chart": [],
+            }
+        },
+    }
+
+
+def _log_pipeline_error(patient_id: str, e: Exception) -> None:
+    """Log a failed note; expected quota/model errors without a stack trace."""
+    if _is_429_error(e):
+        logger.error("patient_id=%s 429/quota: %s", patient_id, str(e))
+    elif _is_404_model_error(e):
+        logger.error("patient_id=%s model 404/unavailable: %s", patient_id, str(e))
+    else:
+        logger.error("patient_id=%s pipeline failed: %s", patient_id, e, exc_info=e)
+
+
+class _JsonArrayFile:
+    """Write a JSON list one item at a time; same layout as json.dump(items, f, indent=2)."""
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self.count = 0
+        self._fh = open(path, "w", encoding="utf-8")
+        self._fh.write("[")
+
+    def append(self, item: dict) -> None:
+        body = json.dumps(item, indent=2, ensure_ascii=False).replace("\n", "\n  ")
+        self._fh.write(("," if self.count else "") + "\n  " + body)
+        self.count += 1
+
+    def close(self) -> None:
+        self._fh.write("\n]" if self.count else "]")
+        self._fh.close()
+
+
+async def _run_all(
+    rows: list[tuple[str, str]],
+    extractions: list[dict] | None = None,
+    on_result: Callable[[dict], None] | None = None,
+) -> int:
+    """
+    Run the pipeline on all (patient_id, note_text) rows concurrently, at most MAX_CONCURRENCY in flight.
+    extractions, if given, are precomputed Agent 1 outputs aligned with rows.
+    A failed note yields an error result instead of cancelling the others.
+    Each result is passed to on_result as soon as it and all earlier rows are done, so results arrive in
+    row order and only out-of-order results are held in memory. Returns the number of results.
+    """
+    sem = asyncio.Semaphore(MAX_CONCURRENCY)
+    finished: dict[int, dict] = {}
+    next_result = 0
+
+    def _emit_ready_results() -> None:
+        nonlocal next_result
+        while next_result in finished:
+            result = finished.pop(next_result)
+            if on_result is not None:
+                on_result(result)
+            next_result += 1
+
+    async def _run_one(i: int, patient_id: str, note_text: str, extraction: dict | None) -> None:
+        async with sem:
+            try:
+                result = await run_pipeline_async(note_text, patient_id=patient_id, extraction_output=extraction)
+                logger.info("patient_id=%s pipeline OK", patient_id)
+            except Exception as e:
+                _log_pipeline_error(patient_id, e)
+                result = _error_result(patient_id, e)
+        finished[i] = result
+        _emit_ready_results()
+
+    await asyncio.gather(
+        *(
+            _run_one(i, patient_id, note_text, extractions[i] if extractions is not None else None)
+            for i, (patient_id, note_text) in enumerate(rows)
+        )
+    )
+    return next_result
 
 
 def main() -> None:
@@ -68,92 +182,45 @@ def main() -> None:
             f"Column '{TEXT_COLUMN}' does not exist. Available: {list(df.columns)}"
         )
 
-    pipeline_results = []
-    for idx, row in df.iterrows():
-        patient_id = _get_patient_id(row, idx)
-        note_text = row[TEXT_COLUMN]
+    rows: list[tuple[str, str]] = []
+    for idx, patient_id, note_text in zip(df.index, _get_patient_ids(df), df[TEXT_COLUMN].tolist()):
         if pd.isna(note_text) or not str(note_text).strip():
             logger.warning("Row %s: empty note, skipping", idx)
             continue
-        try:
-            result = run_pipeline(str(note_text), patient_id=patient_id)
-            pipeline_results.append(result)
-            logger.info("patient_id=%s pipeline OK", patient_id)
-        except (ValueError, json.JSONDecodeError, Exception) as e:
-            if _is_429_error(e):
-                logger.error("patient_id=%s 429/quota: %s", patient_id, str(e))
-            elif _is_404_model_error(e):
-                logger.error("patient_id=%s model 404/unavailable: %s", patient_id, str(e))
-            else:
-                logger.exception("patient_id=%s pipeline failed: %s", patient_id, e)
-            error_extraction = validate_extraction_output(
-                {**empty_schema(patient_id), "error": str(e)}, verbose=True
-            )
-            pipeline_results.append({
-                "extraction": error_extraction,
-                "risk_analysis": {
-                    "summary": "Insufficient data.",
-                    "diabetes_risk_insights": [],
-                    "hypertension_risk_insights": [],
-                    "supporting_evidence": {"labs": [], "vitals": [], "medications": []},
-                    "confidence_level": "low",
-                },
-                "summary": {
-                    "doctor_summary": "",
-                    "patient_summary": "",
-                    "key_flags": [],
-                    "data_gaps": [],
-                },
-                "visualizations": {
-                    "visualizations": {
-                        "risk_levels": {"hypertension": "Low", "diabetes": "Low"},
-                        "risk_scores": {"hypertension_score": 0.25, "diabetes_score": 0.25},
-                        "severity_indicator": {"level": "Low", "color": "green"},
-                        "evidence_chart": [],
-                    }
-                },
-            })
-
-    # Write outputs from orchestrator results
-    extraction_list = [r["extraction"] for r in pipeline_results]
-    risk_list = [
-        {"patient_id": r["extraction"].get("patient_id", ""), **r["risk_analysis"]}
-        for r in pipeline_results
-    ]
-    summary_list = [
-        {"patient_id": r["extraction"].get("patient_id", ""), **r["summary"]}
-        for r in pipeline_results
-    ]
-    viz_list = [
-        {"patient_id": r["extraction"].get("patient_id", ""), **r["visualizations"]}
-        for r in pipeline_results
-    ]
-
-    out_path = _PROJECT_ROOT / "data" / "extraction_results.json"
-    with open(out_path, "w", encoding="utf-8") as f:
-        json.dump(extraction_list, f, indent=2, ensure_ascii=False)
-    logger.info("Wrote %d results to %s", len(extraction_list), out_path)
-
-    risk_path = _PROJECT_ROOT / "data" / "risk_insights.json"
-    with open(risk_path, "w", encoding="utf-8") as f:
-        json.dump(risk_list, f, indent=2, ensure_ascii=False)
-    logger.info("Wrote %d risk insights to %s", len(risk_list), risk_path)
-
-    summary_path = _PROJECT_ROOT / "data" / "summaries.json"
-    with open(summary_path, "w", encoding="utf-8") as f:
-        json.dump(summary_list, f, indent=2, ensure_ascii=False)
-    logger.info("Wrote %d summaries to %s", len(summary_list), summary_path)
-
-    viz_path = _PROJECT_ROOT / "data" / "visualizations.json"
-    with open(viz_path, "w", encoding="utf-8") as f:
-        json.dump(viz_list, f, indent=2, ensure_ascii=False)
-    logger.info("Wrote %d visualizations to %s", len(viz_list), viz_path)
-
-    # Print final pipeline output for each result
+        rows.append((patient_id, str(note_text)))
+
+    extractions = None
+    if "--batch" in sys.argv[1:]:
+        logger.info("Batch mode: submitting %d notes as one Gemini batch job", len(rows))
+        extractions = run_extraction_batch(rows)
+
+    data_dir = _PROJECT_ROOT / "data"
+    risk_out = _JsonArrayFile(data_dir / "risk_insights.json")
+    summary_out = _JsonArrayFile(data_dir / "summaries.json")
+    viz_out = _JsonArrayFile(data_dir / "visualizations.json")
+
     print("\n===== FINAL PIPELINE OUTPUT =====\n")
-    for result in pipeline_results:
-        print(json.dumps(result, indent=2))
-        print()
+    with open(EXTRACTION_RESULTS_PATH, "w", encoding="utf-8") as extraction_fh:
+
+        def _write_result(result: dict) -> None:
+            """Stream one finished note to every output file and stdout."""
+            patient_id = result["extraction"].get("patient_id", "")
+            extraction_fh.write(json.dumps(result["extraction"], ensure_ascii=False) + "\n")
+            extraction_fh.flush()
+            risk_out.append({"patient_id": patient_id, **result["risk_analysis"]})
+            summary_out.append({"patient_id": patient_id, **result["summary"]})
+            viz_out.append({"patient_id": patient_id, **result["visualizations"]})
+            print(json.dumps(result, indent=2))
+            print()
+
+        try:
+            count = asyncio.run(_run_all(rows, extractions, _write_result))
+        finally:
+            for out in (risk_out, summary_out, viz_out):
+                out.close()
+    logger.info("Wrote %d results to %s", count, EXTRACTION_RESULTS_PATH)
+    for out, label in ((risk_out, "risk insights"), (summary_out, "summaries"), (viz_out, "visualizations")):
+        logger.info("Wrote %d %s to %s", out.count, label, out.path)
 
 
 if __name__ == "__main__":
@@ -4,9 +4,10 @@ Runs the full pipeline in order: Extraction → Risk Analysis → Summary → Vi
 Only coordinates existing agents; does not modify their logic.
 """
 
+import asyncio
 from typing import Any
 
-from src.extraction import run_extraction
+from src.extraction import run_extraction, run_extraction_async
 from src.risk_analysis import run_risk_analysis
 from src.summarizer import run_summarization
 from src.visualizer import build_visualization
@@ -43,6 +44,33 @@ def run_pipeline(
     print("Agent 1: Clinical Extraction")
     extraction_output = _extract_clinical_features(input_text, patient_id)
 
+    return _run_downstream(input_text, patient_id, input_type, extraction_output)
+
+
+async def run_pipeline_async(
+    input_text: str,
+    patient_id: str = "pipeline",
+    input_type: str = "text",
+    extraction_output: dict[str, Any] | None = None,
+) -> dict[str, Any]:
+    """
+    Async run_pipeline for concurrent batches: Agent 1 runs via run_extraction_async; Agents 2-4 and
+    persistence run in a worker thread so other notes keep making progress.
+    Pass extraction_output (e.g. from a Gemini batch job) to skip Agent 1.
+    """
+    if extraction_output is None:
+        print("Agent 1: Clinical Extraction")
+        extraction_output = await run_extraction_async(patient_id=patient_id, note_text=input_text)
+    return await asyncio.to_thread(_run_downstream, input_text, patient_id, input_type, extraction_output)
+
+
+def _run_downstream(
+    input_text: str,
+    patient_id: str,
+    input_type: str,
+    extraction_output: dict[str, Any],
+) -> dict[str, Any]:
+    """Agents 2 → 3 → 4 on one extraction, then persist all outputs."""
     print("Agent 2: Risk Analysis")
     risk_output = _analyze_risk(extraction_output)
 
@@ -0,0 +1,39 @@
+"""
+Process-wide Gemini rate limiter shared by every agent call (extraction, JSON repair, risk analysis, summary).
+Token bucket with capacity 1 refilled every RATE_LIMIT_SEC: request starts stay RATE_LIMIT_SEC apart
+across all threads and the asyncio pipeline. The slot is reserved under a threading.Lock; the wait happens
+outside it, so callers queue up in reservation order without holding the lock while sleeping.
+"""
+
+import asyncio
+import threading
+import time
+
+from config.settings import RATE_LIMIT_SEC
+
+_lock = threading.Lock()
+_next_slot: float = 0.0
+
+
+def _reserve_slot() -> float:
+    """Claim the next free request slot. Returns seconds to wait until it starts."""
+    global _next_slot
+    with _lock:
+        now = time.monotonic()
+        start = max(now, _next_slot)
+        _next_slot = start + RATE_LIMIT_SEC
+        return start - now
+
+
+def rate_limit() -> None:
+    """Block the calling thread until its Gemini request may start."""
+    wait = _reserve_slot()
+    if wait > 0:
+        time.sleep(wait)
+
+
+async def rate_limit_async() -> None:
+    """rate_limit for coroutines: same bucket, waits with asyncio.sleep instead of blocking the loop."""
+    wait = _reserve_slot()
+    if wait > 0:
+        await asyncio.sleep(wait)
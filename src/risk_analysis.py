@@ -9,10 +9,10 @@ import logging
 import re
 from typing import Any
 
-from crewai import Crew
-
 from config.settings import DRY_RUN, validate_settings
 from src.agents import get_risk_analyzer_agent
+from src.extraction import _kickoff
+from src.rate_limit import rate_limit
 from src.tasks import risk_analysis_task
 
 logger = logging.getLogger(__name__)
@@ -79,12 +79,9 @@ def run_risk_analysis(extraction_json: dict[str, Any]) -> dict[str, Any]:
         return _default_insight()
 
     task = risk_analysis_task(extraction_json)
-    agent = task.agent
-    crew = Crew(agents=[agent], tasks=[task], memory=False, cache=False)
-
     try:
-        result = crew.kickoff()
-        raw = getattr(result, "raw", None) or str(result)
+        rate_limit()
+        raw = _kickoff(task)
         json_str = _extract_json_from_output(raw)
         obj = json.loads(json_str)
         if isinstance(obj, dict):
@@ -9,10 +9,10 @@ import logging
 import re
 from typing import Any
 
-from crewai import Crew
-
 from config.settings import DRY_RUN, validate_settings
 from src.agents import get_summarizer_agent
+from src.extraction import _kickoff
+from src.rate_limit import rate_limit
 from src.tasks import summarizer_task
 
 logger = logging.getLogger(__name__)
@@ -66,12 +66,9 @@ def run_summarization(extraction_json: dict[str, Any], risk_analysis_json: dict[
         return _default_summary()
 
     task = summarizer_task(extraction_json, risk_analysis_json)
-    agent = task.agent
-    crew = Crew(agents=[agent], tasks=[task], memory=False, cache=False)
-
     try:
-        result = crew.kickoff()
-        raw = getattr(result, "raw", None) or str(result)
+        rate_limit()
+        raw = _kickoff(task)
         json_str = _extract_json_from_output(raw)
         obj = json.loads(json_str)
         if isinstance(obj, dict):
@@ -3,8 +3,11 @@ CrewAI tasks for clinical extraction and JSON repair.
 """
 
 import json
+import re
+
 from crewai import Task
 
+from config.settings import TRIM_NOTES
 from src.agents import get_extractor_agent, get_risk_analyzer_agent, get_summarizer_agent
 
 JSON_GUARDRAIL_TOP = "Output a single JSON object. No markdown, no backticks, no explanations. Required keys present; empty string or [] when not found."
@@ -15,18 +18,99 @@ EXPECTED_JSON_INSTRUCTION = (
     "Use empty string or empty array when not found."
 )
 
+# Note trimming (TRIM_NOTES): notes longer than NOTE_TRIM_MIN_CHARS keep every medication section whole, plus
+# lines within NOTE_CONTEXT_LINES of a line mentioning diabetes/BP terms, glucose/A1c, a SYS/DIA reading, or a
+# diabetes/antihypertensive drug. Only narrative is cut: fewer input tokens per call, lower latency and cost.
+NOTE_TRIM_MIN_CHARS = 6000
+NOTE_CONTEXT_LINES = 8
+RELEVANT_LINE_PATTERN = re.compile(
+    r"diabet|\bt?[12]?dm(?:i{1,2}|[12])?\b|\bn?iddm\b|hypertens|\bhtn\b|a1c|glucose|\bbp\b|blood pressure|mmhg|\b\d{2,3}/\d{2,3}\b"
+    r"|insulin|formin|glipizide|glyburide|glimepiride|gliptin|gliflozin|glutide|glargine|detemir|degludec|lispro"
+    r"|aspart|humalog|novolog|lantus|levemir|tresiba|jardiance|farxiga|januvia|ozempic|trulicity|victoza"
+    r"|pril\b|sartan\b|lol\b|dipine\b|thiazide|hctz|chlorthalidone|furosemide|torsemide|bumetanide|lasix"
+    r"|hydralazine|clonidine|spironolactone|minoxidil|doxazosin|terazosin|prazosin",
+    re.IGNORECASE,
+)
+# Medication section headers (MIMIC: "Medications on Admission:", "Discharge Medications:", ...)
+MEDICATION_SECTION_PATTERN = re.compile(
+    r"^\s*(?:(?:discharge|admission|home|outpatient|preadmission)\s+medications|medications\s+on\s+(?:admission|discharge))\s*:",
+    re.IGNORECASE,
+)
+# Any section header line ("Discharge Disposition:", "Followup Instructions:"); ends a medication section
+SECTION_HEADER_PATTERN = re.compile(r"^\s*[A-Za-z][A-Za-z /&(),-]{2,60}:\s*$")
+
+
+def _medication_sections(lines: list[str]) -> list[tuple[int, int]]:
+    """[start, end) line ranges from each medication header up to the next section header (or end of note)."""
+    sections: list[tuple[int, int]] = []
+    i = 0
+    while i < len(lines):
+        if not MEDICATION_SECTION_PATTERN.match(lines[i]):
+            i += 1
+            continue
+        end = i + 1
+        while end < len(lines) and not (
+            SECTION_HEADER_PATTERN.match(lines[end]) and not MEDICATION_SECTION_PATTERN.match(lines[end])
+        ):
+            end += 1
+        sections.append((i, end))
+        i = end
+    return sections
+
+
+def _trim_note(note_text: str, context: int = NOTE_CONTEXT_LINES) -> str:
+    """
+    Keep medication sections and lines within `context` lines of a relevant line; dropped runs become "...".
+    Returned unchanged when TRIM_NOTES is off, the note is short, or nothing relevant is found.
+    """
+    if not TRIM_NOTES or len(note_text) < NOTE_TRIM_MIN_CHARS:
+        return note_text
+    lines = note_text.splitlines()
+    ranges = _medication_sections(lines) + [
+        (max(0, i - context), min(len(lines), i + context + 1))
+        for i, line in enumerate(lines)
+        if RELEVANT_LINE_PATTERN.search(line)
+    ]
+    if not ranges:
+        return note_text
+    # Merge overlapping/adjacent [start, end) ranges
+    windows: list[list[int]] = []
+    for start, end in sorted(ranges):
+        if windows and start <= windows[-1][1]:
+            windows[-1][1] = max(windows[-1][1], end)
+        else:
+            windows.append([start, end])
+    parts: list[str] = []
+    prev_end = 0
+    for start, end in windows:
+        if start > prev_end:
+            parts.append("...")
+        parts.extend(lines[start:end])
+        prev_end = end
+    if prev_end < len(lines):
+        parts.append("...")
+    return "\n".join(parts)
+
+
+# Constant parts of the extraction prompt, built once; per note only the note text is spliced in
+_DESC_PREFIX = (
+    JSON_GUARDRAIL_TOP + "\n\n"
+    "From the discharge note below, extract only explicitly stated diabetes and blood pressure data.\n\n"
+    "Discharge note:\n---\n"
+)
+_DESC_SUFFIX = "\n---\n\n" + EXPECTED_JSON_INSTRUCTION
+
+
+def extraction_prompt(note_text: str) -> str:
+    """Extraction instructions + note text; shared by extraction_task and the batch path (src/batch_extraction.py)."""
+    return "".join((_DESC_PREFIX, _trim_note(note_text), _DESC_SUFFIX))
+
 
 def extraction_task(patient_id: str, note_text: str) -> Task:
     """Create a Task that extracts diabetes and BP data from one discharge note."""
     agent = get_extractor_agent()
     return Task(
-        description=(
-            JSON_GUARDRAIL_TOP + "\n\n"
-            "From the discharge note below, extract only explicitly stated diabetes and blood pressure data.\n\n"
-            "Discharge note:\n---\n"
-            f"{note_text}\n---\n\n"
-            + EXPECTED_JSON_INSTRUCTION
-        ),
+        description=extraction_prompt(note_text),
         expected_output="Single JSON object. No markdown or backticks.",
         agent=agent,
     )
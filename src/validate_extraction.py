@@ -1,33 +1,48 @@
 """
 Validate Extractor Agent output against a gold-standard dataset.
 
-Loads data/gold_standard.json (ground truth) and data/extraction_results.json
-(agent output), aligns by index and patient_id, and computes accuracy (exact
+Loads data/gold_standard.json (ground truth) and data/extraction_results.ndjson
+(agent output streamed by main.py; falls back to the older data/extraction_results.json),
+aligns by index and patient_id, and computes accuracy (exact
 match) and recall (list fields) for diabetes and blood pressure metrics.
-Uses only standard library; no external ML libraries.
+Metric fields are read once per record into a pandas DataFrame and every metric
+is a column-wise comparison; no external ML libraries.
 """
 
 import json
 import sys
 from pathlib import Path
 
+import pandas as pd
+
 # Project root for data paths
 PROJECT_ROOT = Path(__file__).resolve().parent.parent
 GOLD_PATH = PROJECT_ROOT / "data" / "gold_standard.json"
-EXTRACTION_PATH = PROJECT_ROOT / "data" / "extraction_results.json"
+EXTRACTION_PATH = PROJECT_ROOT / "data" / "extraction_results.ndjson"
+LEGACY_EXTRACTION_PATH = PROJECT_ROOT / "data" / "extraction_results.json"
 
 
 def _load_json(path: Path) -> list:
-    """Load a JSON file; must be a list. Raises on missing file or invalid content."""
+    """
+    Load a JSON list, or NDJSON (.ndjson / .jsonl: one object per line) as a list.
+    Raises on missing file or invalid content.
+    """
     if not path.exists():
         raise FileNotFoundError(f"Missing file: {path}")
     with open(path, encoding="utf-8") as f:
+        if path.suffix in (".ndjson", ".jsonl"):
+            return [json.loads(line) for line in f if line.strip()]
         data = json.load(f)
     if not isinstance(data, list):
         raise ValueError(f"Expected a JSON list in {path}, got {type(data).__name__}")
     return data
 
 
+# Dotted metric fields: scalars are compared by exact match, lists by recall
+SCALAR_FIELDS = ("diabetes.type", "diabetes.status", "blood_pressure.hypertension_status")
+LIST_FIELDS = ("diabetes.a1c_values", "diabetes.glucose_values", "blood_pressure.bp_readings")
+
+
 def _get_nested(obj: dict, *keys: str, default_list: list | None = None) -> str | list:
     """
     Safely get a nested value. Missing keys yield default: '' for last key if
@@ -52,6 +67,74 @@ def _ensure_list(val: list | str | None) -> list:
     return list(val) if isinstance(val, list) else []
 
 
+def _flatten(records: list) -> pd.DataFrame:
+    """
+    One row per sample, one object column per metric field (dotted name, e.g. "diabetes.type").
+    Values are read with _get_nested, so non-dict records or sections score as empty and
+    nested values are never split into extra columns.
+    """
+    columns = {field: [_get_nested(r, *field.split(".")) or "" for r in records] for field in SCALAR_FIELDS}
+    for field in LIST_FIELDS:
+        columns[field] = [_get_nested(r, *field.split("."), default_list=[]) for r in records]
+    return pd.DataFrame(columns, dtype=object)
+
+
+def _scalar_str(val) -> str:
+    """None or "" → ""; anything else (including dicts/lists) → its stripped str()."""
+    return "" if val is None or (isinstance(val, str) and val == "") else str(val).strip()
+
+
+def _scalar_column(df: pd.DataFrame, field: str) -> pd.Series:
+    """Field as stripped strings; missing key or null → ""."""
+    if field not in df.columns:
+        return pd.Series("", index=df.index, dtype=object)
+    return df[field].map(_scalar_str)
+
+
+def _list_items(df: pd.DataFrame, field: str) -> pd.DataFrame:
+    """
+    Long table (sample, item) of a list field's items as stripped str() (None → "None");
+    missing or non-list values contribute none.
+    """
+    if field not in df.columns:
+        return pd.DataFrame({"sample": pd.Series(dtype="int64"), "item": pd.Series(dtype=object)})
+    items = df[field].map(lambda v: [str(x).strip() for x in _ensure_list(v)]).explode().dropna()
+    return pd.DataFrame({"sample": items.index, "item": items.to_numpy()})
+
+
+def exact_match_accuracy(gold_df: pd.DataFrame, pred_df: pd.DataFrame, field: str) -> float:
+    """
+    Exact-match accuracy: fraction of samples where predicted value equals gold.
+    Frames are aligned by row position; field is a dotted column name.
+    """
+    n = len(gold_df)
+    if n == 0:
+        return 0.0
+    gold = _scalar_column(gold_df, field).to_numpy()
+    pred = _scalar_column(pred_df, field).to_numpy()
+    return float((gold == pred).mean())
+
+
+def list_recall(gold_df: pd.DataFrame, pred_df: pd.DataFrame, field: str) -> float:
+    """
+    Micro-averaged recall for list fields: TP / (TP + FN).
+    TP = gold items that appear in the same sample's predicted list (exact string match).
+    FN = gold items that do not appear in predicted list.
+    Missing predicted list when gold has items counts as FN for those items.
+    If there are no gold items across all samples, return 1.0 by convention.
+    """
+    gold = _list_items(gold_df, field)
+    if gold.empty:
+        return 1.0
+    pred = _list_items(pred_df, field).drop_duplicates()
+    matched = gold.merge(pred, on=["sample", "item"], how="left", indicator=True)["_merge"].eq("both")
+    return float(matched.sum() / len(gold))
+
+
+def _getter_frame(samples: list[dict], getter: callable) -> pd.DataFrame:
+    return pd.DataFrame({"value": [getter(s) for s in samples]}, dtype=object)
+
+
 def compute_exact_match_accuracy(
     gold_list: list[dict],
     pred_list: list[dict],
@@ -59,22 +142,16 @@ def compute_exact_match_accuracy(
     getter_pred: callable,
 ) -> float:
     """
-    Exact-match accuracy: fraction of samples where predicted value equals gold.
+    Exact-match accuracy over getter values; same comparison as exact_match_accuracy.
     getter_*(sample) returns the value to compare (string or normalized value).
+    Samples are paired like zip(); the score is divided by len(gold_list).
     """
-    n = len(gold_list)
+    n = min(len(gold_list), len(pred_list))
     if n == 0:
         return 0.0
-    correct = 0
-    for gold, pred in zip(gold_list, pred_list):
-        g = getter_gold(gold)
-        p = getter_pred(pred)
-        # Normalize: treat None or missing as empty string for scalar fields
-        g_str = "" if g is None or g == "" else str(g).strip()
-        p_str = "" if p is None or p == "" else str(p).strip()
-        if g_str == p_str:
-            correct += 1
-    return correct / n
+    gold = _scalar_column(_getter_frame(gold_list[:n], getter_gold), "value").to_numpy()
+    pred = _scalar_column(_getter_frame(pred_list[:n], getter_pred), "value").to_numpy()
+    return float((gold == pred).sum() / len(gold_list))
 
 
 def compute_list_recall(
@@ -83,28 +160,11 @@ def compute_list_recall(
     getter_gold: callable,
     getter_pred: callable,
 ) -> float:
-    """
-    Micro-averaged recall for list fields: TP / (TP + FN).
-    TP = gold items that appear in predicted list (exact string match).
-    FN = gold items that do not appear in predicted list.
-    Missing predicted list when gold has items counts as FN for those items.
-    If there are no gold items across all samples, return 1.0 by convention.
-    """
-    total_tp = 0
-    total_fn = 0
-    for gold, pred in zip(gold_list, pred_list):
-        g_items = _ensure_list(getter_gold(gold))
-        p_items = _ensure_list(getter_pred(pred))
-        for g_item in g_items:
-            g_str = str(g_item).strip()
-            if g_str in [str(x).strip() for x in p_items]:
-                total_tp += 1
-            else:
-                total_fn += 1
-    total_relevant = total_tp + total_fn
-    if total_relevant == 0:
-        return 1.0
-    return total_tp / total_relevant
+    """Micro-averaged recall over getter lists; wrapper around list_recall. Samples are paired like zip()."""
+    n = min(len(gold_list), len(pred_list))
+    return list_recall(
+        _getter_frame(gold_list[:n], getter_gold), _getter_frame(pred_list[:n], getter_pred), "value",
+    )
 
 
 def run_validation(gold_path: Path, extraction_path: Path) -> dict:
@@ -127,52 +187,21 @@ def run_validation(gold_path: Path, extraction_path: Path) -> dict:
             "bp_hypertension_status_accuracy": 0.0,
             "bp_readings_recall": 1.0,
         }
-    gold_slice = gold_list[:n]
-    pred_slice = pred_list[:n]
-
-    # Getters: treat missing nested structs as empty string or empty list
-    def get_diabetes_type(obj: dict) -> str:
-        return _get_nested(obj, "diabetes", "type") or ""
-
-    def get_diabetes_status(obj: dict) -> str:
-        return _get_nested(obj, "diabetes", "status") or ""
-
-    def get_diabetes_a1c(obj: dict) -> list:
-        return _ensure_list(_get_nested(obj, "diabetes", "a1c_values", default_list=[]))
-
-    def get_diabetes_glucose(obj: dict) -> list:
-        return _ensure_list(_get_nested(obj, "diabetes", "glucose_values", default_list=[]))
-
-    def get_bp_status(obj: dict) -> str:
-        return _get_nested(obj, "blood_pressure", "hypertension_status") or ""
-
-    def get_bp_readings(obj: dict) -> list:
-        return _ensure_list(_get_nested(obj, "blood_pressure", "bp_readings", default_list=[]))
+    gold_df = _flatten(gold_list[:n])
+    pred_df = _flatten(pred_list[:n])
 
     return {
         "n_samples": n,
         # Diabetes: exact-match accuracy for type and status
-        "diabetes_type_accuracy": compute_exact_match_accuracy(
-            gold_slice, pred_slice, get_diabetes_type, get_diabetes_type,
-        ),
-        "diabetes_status_accuracy": compute_exact_match_accuracy(
-            gold_slice, pred_slice, get_diabetes_status, get_diabetes_status,
-        ),
+        "diabetes_type_accuracy": exact_match_accuracy(gold_df, pred_df, "diabetes.type"),
+        "diabetes_status_accuracy": exact_match_accuracy(gold_df, pred_df, "diabetes.status"),
         # Diabetes: recall for list fields (gold items recovered in pred)
-        "diabetes_a1c_recall": compute_list_recall(
-            gold_slice, pred_slice, get_diabetes_a1c, get_diabetes_a1c,
-        ),
-        "diabetes_glucose_recall": compute_list_recall(
-            gold_slice, pred_slice, get_diabetes_glucose, get_diabetes_glucose,
-        ),
+        "diabetes_a1c_recall": list_recall(gold_df, pred_df, "diabetes.a1c_values"),
+        "diabetes_glucose_recall": list_recall(gold_df, pred_df, "diabetes.glucose_values"),
         # Blood pressure: exact-match accuracy for hypertension_status
-        "bp_hypertension_status_accuracy": compute_exact_match_accuracy(
-            gold_slice, pred_slice, get_bp_status, get_bp_status,
-        ),
+        "bp_hypertension_status_accuracy": exact_match_accuracy(gold_df, pred_df, "blood_pressure.hypertension_status"),
         # Blood pressure: recall for bp_readings
-        "bp_readings_recall": compute_list_recall(
-            gold_slice, pred_slice, get_bp_readings, get_bp_readings,
-        ),
+        "bp_readings_recall": list_recall(gold_df, pred_df, "blood_pressure.bp_readings"),
     }
 
 
@@ -212,12 +241,12 @@ def print_report(metrics: dict) -> None:
 def main() -> int:
     """Entry point: load paths, run validation, print report. Returns 0 on success."""
     gold_path = GOLD_PATH
-    extraction_path = EXTRACTION_PATH
+    extraction_path = EXTRACTION_PATH if EXTRACTION_PATH.exists() else LEGACY_EXTRACTION_PATH
     if len(sys.argv) >= 3:
         gold_path = Path(sys.argv[1])
         extraction_path = Path(sys.argv[2])
     elif len(sys.argv) == 2:
-        print("Usage: validate_extraction.py [gold_standard.json extraction_results.json]", file=sys.stderr)
+        print("Usage: validate_extraction.py [gold_standard.json extraction_results.ndjson|.json]", file=sys.stderr)
         return 1
     try:
         metrics = run_validation(gold_path, extraction_path)
@@ -0,0 +1,107 @@
+"""
+Unit tests for batch extraction: response parsing, scope gate, result order (no network; Gemini client mocked).
+Run from project root: python -m unittest tests.test_batch_extraction -v
+"""
+
+import json
+import sys
+import unittest
+from pathlib import Path
+from types import SimpleNamespace
+from unittest import mock
+
+# Project root on path
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from src import batch_extraction
+
+_response_text = batch_extraction._response_text
+
+ROWS = [
+    ("p0", "Type 2 diabetes mellitus, on metformin."),
+    ("p1", "Ankle sprain, no chronic conditions."),
+    ("p2", "History of hypertension."),
+    ("p3", "Diabetes mellitus type 1."),
+]
+
+
+def _output_line(key, diabetes_type: str) -> str:
+    text = json.dumps({"diabetes": {"type": diabetes_type, "status": "controlled"}})
+    return json.dumps({"key": key, "response": {"candidates": [{"content": {"parts": [{"text": text}]}}]}})
+
+
+def _mock_client(output_lines: list[str], uploaded: list[str]) -> mock.MagicMock:
+    """Client whose job succeeds at once and returns output_lines; uploaded JSONL lines are collected."""
+    client = mock.MagicMock()
+
+    def upload(file, config):
+        uploaded.extend(Path(file).read_text(encoding="utf-8").splitlines())
+        return SimpleNamespace(name="files/requests")
+
+    client.files.upload.side_effect = upload
+    client.batches.create.return_value = SimpleNamespace(name="batches/1")
+    client.batches.get.return_value = SimpleNamespace(
+        name="batches/1",
+        state=SimpleNamespace(name="JOB_STATE_SUCCEEDED"),
+        dest=SimpleNamespace(file_name="files/output"),
+        error=None,
+    )
+    client.files.download.return_value = ("\n".join(output_lines) + "\n").encode("utf-8")
+    return client
+
+
+class TestResponseText(unittest.TestCase):
+    """_response_text: text of the first candidate, None for failed lines."""
+
+    def test_error_line_returns_none(self):
+        line = {"key": "0", "error": {"code": 500, "message": "internal"}}
+        self.assertIsNone(_response_text(line))
+
+    def test_empty_candidates_returns_none(self):
+        self.assertIsNone(_response_text({"key": "0", "response": {"candidates": []}}))
+        self.assertIsNone(_response_text({"key": "0", "response": {}}))
+
+    def test_joins_text_parts(self):
+        line = {"response": {"candidates": [{"content": {"parts": [{"text": "{\"a\": "}, {"text": "1}"}]}}]}}
+        self.assertEqual(_response_text(line), "{\"a\": 1}")
+
+
+class TestRunExtractionBatch(unittest.TestCase):
+    """run_extraction_batch with a mocked Gemini client."""
+
+    def _run(self, output_lines: list[str]) -> tuple[list[dict], list[str]]:
+        uploaded: list[str] = []
+        client = _mock_client(output_lines, uploaded)
+        with mock.patch.object(batch_extraction, "DRY_RUN", False), \
+                mock.patch.object(batch_extraction, "validate_settings"), \
+                mock.patch("google.genai.Client", return_value=client):
+            results = batch_extraction.run_extraction_batch(ROWS)
+        return results, uploaded
+
+    def test_out_of_scope_rows_not_submitted(self):
+        """Only notes mentioning diabetes/hypertension go into the JSONL; others get the empty schema."""
+        results, uploaded = self._run([_output_line("0", "type 2"), _output_line("2", ""), _output_line("3", "type 1")])
+        self.assertEqual(sorted(json.loads(line)["key"] for line in uploaded), ["0", "2", "3"])
+        self.assertEqual(results[1]["patient_id"], "p1")
+        self.assertNotIn("error", results[1])
+        self.assertEqual(results[1]["diabetes"]["type"], "")
+
+    def test_shuffled_and_missing_lines_keep_input_order(self):
+        """Results follow input order; missing keys become error payloads; unknown keys are ignored."""
+        results, _ = self._run([
+            _output_line("3", "type 1"),
+            _output_line("7", "bogus"),
+            _output_line("-1", "bogus"),
+            _output_line("0", "type 2"),
+        ])
+        self.assertEqual([r["patient_id"] for r in results], ["p0", "p1", "p2", "p3"])
+        self.assertEqual(results[0]["diabetes"]["type"], "type 2")
+        self.assertEqual(results[3]["diabetes"]["type"], "type 1")
+        self.assertIn("error", results[2])
+        self.assertNotIn("error", results[0])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -3,8 +3,10 @@ Unit tests for extraction: JSON validity, empty-safe behavior, scope enforcement
 Run from project root: python -m unittest tests.test_extraction -v
 """
 
+import asyncio
 import json
 import sys
+import threading
 import unittest
 from pathlib import Path
 
@@ -13,7 +15,7 @@ PROJECT_ROOT = Path(__file__).resolve().parent.parent
 if str(PROJECT_ROOT) not in sys.path:
     sys.path.insert(0, str(PROJECT_ROOT))
 
-from src import extraction
+from src import extraction, rate_limit, tasks
 
 run_extraction = extraction.run_extraction
 _empty_schema = extraction._empty_schema
@@ -25,6 +27,7 @@ _filter_abnormal_markers_lab_only = extraction._filter_abnormal_markers_lab_only
 _filter_bp_readings_strict = extraction._filter_bp_readings_strict
 _dedupe_list = extraction._dedupe_list
 _error_payload = extraction._error_payload
+_extract_raw_json = extraction._extract_raw_json
 
 
 class TestJsonValidity(unittest.TestCase):
@@ -48,6 +51,17 @@ class TestJsonValidity(unittest.TestCase):
         back = json.loads(json.dumps(out))
         self.assertEqual(back["patient_id"], out["patient_id"])
 
+    def test_run_extraction_async_dry_run_matches_sync(self):
+        """run_extraction_async(DRY_RUN) returns the same schema dict as run_extraction."""
+        orig = getattr(extraction, "DRY_RUN", False)
+        extraction.DRY_RUN = True
+        try:
+            out = asyncio.run(extraction.run_extraction_async("test_id", "some note"))
+            expected = run_extraction("test_id", "some note")
+        finally:
+            extraction.DRY_RUN = orig
+        self.assertEqual(out, expected)
+
     def test_schema_validate_final_output_is_valid_json(self):
         """_schema_validate_final returns only schema keys; round-trips via json."""
         obj = {
@@ -62,6 +76,20 @@ class TestJsonValidity(unittest.TestCase):
         self.assertEqual(set(parsed["diabetes"].keys()), {"type", "status", "a1c_values", "glucose_values", "medications"})
         self.assertEqual(set(parsed["blood_pressure"].keys()), {"hypertension_status", "bp_readings", "medications"})
 
+    def test_extract_raw_json_from_fenced_and_prose_output(self):
+        """_extract_raw_json returns exactly the JSON object from fenced or prose-wrapped output."""
+        fenced = 'Here you go:\n```json\n{"patient_id": "p1", "abnormal_markers": ["Glucose-150*"]}\n```\nDone.'
+        self.assertEqual(json.loads(_extract_raw_json(fenced))["patient_id"], "p1")
+        trailing = '{"patient_id": "p2"} Note: values with {braces} omitted.'
+        self.assertEqual(_extract_raw_json(trailing), '{"patient_id": "p2"}')
+
+    def test_parse_and_normalize_repairs_trailing_comma_in_fence(self):
+        """Invalid JSON inside a fence still goes through string repair."""
+        raw = '```json\n{"patient_id": "", "abnormal_markers": ["HbA1c-8.1*",],}\n```'
+        result = _parse_and_normalize(raw, "p3")
+        self.assertIsNotNone(result)
+        self.assertEqual(result["abnormal_markers"], ["HbA1c-8.1*"])
+
 
 class TestEmptySafe(unittest.TestCase):
     """Empty-safe behavior: missing keys get defaults; failures return full schema."""
@@ -142,5 +170,121 @@ class TestScopeEnforcement(unittest.TestCase):
         self.assertEqual(result["patient_id"], "correct_id")
 
 
+class TestNoteTrimming(unittest.TestCase):
+    """Long notes are cut to diabetes/BP-relevant windows + medication sections before prompting; short notes untouched."""
+
+    def test_short_note_unchanged(self):
+        """Notes under NOTE_TRIM_MIN_CHARS are sent as-is."""
+        note = "Social history: lives alone.\nPMH: Type 2 diabetes."
+        self.assertEqual(tasks._trim_note(note), note)
+
+    def test_long_note_keeps_context_around_relevant_lines(self):
+        """Relevant lines and their context survive; distant filler is replaced by '...'."""
+        filler = ["Unrelated narrative line %d about the hospital course." % i for i in range(300)]
+        lines = filler[:100] + ["PMH: Type 2 diabetes, HTN", "BP 182/96 on admission"] + filler[100:]
+        trimmed = tasks._trim_note("\n".join(lines), context=2)
+        out = trimmed.splitlines()
+        self.assertIn("PMH: Type 2 diabetes, HTN", out)
+        self.assertIn("BP 182/96 on admission", out)
+        self.assertIn(filler[99], out)
+        self.assertNotIn(filler[0], out)
+        self.assertEqual(out[0], "...")
+        self.assertEqual(out[-1], "...")
+        self.assertLess(len(trimmed), tasks.NOTE_TRIM_MIN_CHARS)
+
+    def test_diabetes_abbreviations_are_relevant(self):
+        """MIMIC shorthand (DM2, DMII, T2DM, DM1, NIDDM) alone keeps a line that no other keyword is near."""
+        filler = ["Unrelated narrative line %d about the hospital course." % i for i in range(300)]
+        for line in ("PMH: DM2, CAD", "h/o DMII on orals", "T2DM, CKD3", "DM1 since childhood", "NIDDM"):
+            note = "\n".join(filler[:150] + [line] + filler[150:])
+            self.assertIn(line, tasks._trim_note(note, context=2).splitlines())
+        self.assertIsNone(tasks.RELEVANT_LINE_PATTERN.search("Admitted from the DMV office"))
+
+    def test_medication_sections_kept_whole(self):
+        """Every line of the admission/discharge medication lists survives, even far from a keyword."""
+        narrative = [
+            "Patient was seen and examined on the floor; overnight events reviewed with nursing staff. (%d)" % i
+            for i in range(40)
+        ]
+        admission_meds = [
+            "Medications on Admission:",
+            "The Preadmission Medication list is accurate and complete.",
+            "1. Carvedilol 25 mg PO BID",
+            "2. Lantus 20 Units Bedtime",
+            "3. Atorvastatin 40 mg PO QPM",
+        ]
+        discharge_meds = [
+            "Discharge Medications:",
+            "1. Aspirin 81 mg PO DAILY",
+            "2. Atorvastatin 40 mg PO QPM",
+            "3. Carvedilol 25 mg PO BID",
+            "4. Glargine 20 Units Bedtime",
+            "5. Humalog 6 Units Breakfast",
+            "6. HCTZ 25 mg PO DAILY",
+            "7. Furosemide 20 mg PO DAILY",
+            "8. Jardiance 10 mg PO DAILY",
+            "9. Labetalol 200 mg PO TID",
+            "10. Pantoprazole 40 mg PO Q24H",
+            "11. Senna 8.6 mg PO BID:PRN constipation",
+            "12. Docusate Sodium 100 mg PO BID",
+            "13. Acetaminophen 650 mg PO Q6H:PRN pain",
+            "14. Tamsulosin 0.4 mg PO QHS",
+        ]
+        lines = (
+            ["Chief Complaint:", "Chest pain", "History of Present Illness:"] + narrative
+            + ["Past Medical History:", "Type 2 diabetes, hypertension"] + narrative
+            + admission_meds + narrative
+            + ["Brief Hospital Course:"] + narrative
+            + discharge_meds
+            + ["Discharge Disposition:", "Home"] + narrative
+        )
+        note = "\n".join(lines)
+        self.assertGreater(len(note), tasks.NOTE_TRIM_MIN_CHARS)
+        out = tasks._trim_note(note).splitlines()
+        for line in admission_meds + discharge_meds:
+            self.assertIn(line, out)
+        self.assertIn("Type 2 diabetes, hypertension", out)
+        self.assertIn("...", out)
+        self.assertLess(len(out), len(lines))
+
+    def test_trimming_disabled_by_setting(self):
+        """TRIM_NOTES=false sends long notes unchanged."""
+        note = "\n".join(["Narrative line %d." % i for i in range(500)] + ["PMH: diabetes"])
+        orig = tasks.TRIM_NOTES
+        tasks.TRIM_NOTES = False
+        try:
+            self.assertEqual(tasks._trim_note(note), note)
+        finally:
+            tasks.TRIM_NOTES = orig
+        self.assertNotEqual(tasks._trim_note(note), note)
+
+    def test_long_note_without_relevant_lines_unchanged(self):
+        """No relevant line → no trimming (scope gate decides what to do with the note)."""
+        note = "\n".join("Narrative line %d." % i for i in range(1000))
+        self.assertEqual(tasks._trim_note(note), note)
+
+
+class TestRateLimit(unittest.TestCase):
+    """One limiter for all agents: concurrent callers get distinct slots RATE_LIMIT_SEC apart."""
+
+    def test_concurrent_threads_get_spaced_slots(self):
+        orig_sec, orig_slot = rate_limit.RATE_LIMIT_SEC, rate_limit._next_slot
+        rate_limit.RATE_LIMIT_SEC = 10.0
+        rate_limit._next_slot = 0.0
+        waits: list[float] = []
+        try:
+            threads = [threading.Thread(target=lambda: waits.append(rate_limit._reserve_slot())) for _ in range(6)]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+        finally:
+            rate_limit.RATE_LIMIT_SEC, rate_limit._next_slot = orig_sec, orig_slot
+        waits.sort()
+        self.assertLess(waits[0], 1.0)
+        for earlier, later in zip(waits, waits[1:]):
+            self.assertAlmostEqual(later - earlier, 10.0, delta=1.0)
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,58 @@
+"""
+Unit tests for the CLI pipeline runner: results stream in row order (run_pipeline_async stubbed, no API calls).
+Run from project root: python -m unittest tests.test_main -v
+"""
+
+import asyncio
+import io
+import json
+import sys
+import unittest
+from pathlib import Path
+from unittest import mock
+
+# Project root on path
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from src import main
+
+ROWS = [(f"p{i}", f"note {i}") for i in range(6)]
+
+
+async def _out_of_order_pipeline(note_text: str, patient_id: str, extraction_output=None) -> dict:
+    """Later rows finish first; p3 fails."""
+    i = int(patient_id[1:])
+    await asyncio.sleep(0.01 * (len(ROWS) - i))
+    if patient_id == "p3":
+        raise RuntimeError("boom")
+    return {
+        "extraction": {"patient_id": patient_id},
+        "risk_analysis": {},
+        "summary": {},
+        "visualizations": {},
+    }
+
+
+class TestRunAll(unittest.TestCase):
+    """_run_all hands results to on_result in row order even when notes finish out of order."""
+
+    def test_ndjson_lines_follow_row_order(self):
+        fh = io.StringIO()
+
+        def write_line(result: dict) -> None:
+            fh.write(json.dumps(result["extraction"]) + "\n")
+
+        with mock.patch.object(main, "run_pipeline_async", _out_of_order_pipeline):
+            count = asyncio.run(main._run_all(ROWS, on_result=write_line))
+
+        lines = [json.loads(line) for line in fh.getvalue().splitlines()]
+        self.assertEqual(count, len(ROWS))
+        self.assertEqual([line["patient_id"] for line in lines], [pid for pid, _ in ROWS])
+        self.assertIn("error", lines[3])
+        self.assertNotIn("error", lines[0])
+
+
+if __name__ == "__main__":
+    unittest.main()
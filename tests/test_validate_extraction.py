@@ -0,0 +1,83 @@
+"""
+Unit tests for validate_extraction: metrics on malformed records match the original per-sample getters.
+Run from project root: python -m unittest tests.test_validate_extraction -v
+"""
+
+import json
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+# Project root on path
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from src import validate_extraction
+
+GOLD_TYPE2 = {
+    "diabetes": {"type": "type 2", "status": "", "a1c_values": ["8.1"], "glucose_values": []},
+    "blood_pressure": {"hypertension_status": "", "bp_readings": []},
+}
+
+
+def _run(gold: list, pred: list) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        gold_path = Path(tmp) / "gold.json"
+        pred_path = Path(tmp) / "pred.ndjson"
+        gold_path.write_text(json.dumps(gold), encoding="utf-8")
+        pred_path.write_text("".join(json.dumps(p) + "\n" for p in pred), encoding="utf-8")
+        return validate_extraction.run_validation(gold_path, pred_path)
+
+
+class TestMalformedRecords(unittest.TestCase):
+    """Pinned results from the original getter-based metrics."""
+
+    def test_non_dict_record_scores_as_empty(self):
+        """A non-dict prediction is treated as an empty record, not a crash."""
+        metrics = _run([GOLD_TYPE2, {}], ["not a record", None])
+        self.assertEqual(metrics["n_samples"], 2)
+        self.assertEqual(metrics["diabetes_type_accuracy"], 0.5)
+        self.assertEqual(metrics["diabetes_status_accuracy"], 1.0)
+        self.assertEqual(metrics["diabetes_a1c_recall"], 0.0)
+
+    def test_dict_valued_scalar_does_not_match_empty_gold(self):
+        """A dict where a string is expected compares as its str(), so it does not match an empty gold value."""
+        gold = [{"diabetes": {"type": ""}}]
+        pred = [{"diabetes": {"type": {"code": "E11"}}}]
+        self.assertEqual(_run(gold, pred)["diabetes_type_accuracy"], 0.0)
+
+    def test_none_list_items_count_as_false_negatives(self):
+        """None gold items are compared as "None" and count toward recall."""
+        gold = [{"diabetes": {"a1c_values": [None, "8.1"]}, "blood_pressure": {"bp_readings": [None]}}]
+        pred = [{"diabetes": {"a1c_values": ["8.1"]}, "blood_pressure": {"bp_readings": []}}]
+        metrics = _run(gold, pred)
+        self.assertEqual(metrics["diabetes_a1c_recall"], 0.5)
+        self.assertEqual(metrics["bp_readings_recall"], 0.0)
+
+    def test_getter_wrappers_keep_none_items(self):
+        """compute_list_recall counts None items from getters the same way."""
+        gold = [{"v": [None, "1"]}]
+        pred = [{"v": ["1"]}]
+        recall = validate_extraction.compute_list_recall(gold, pred, lambda s: s["v"], lambda s: s["v"])
+        self.assertEqual(recall, 0.5)
+
+
+class TestGetterWrappers(unittest.TestCase):
+    """compute_* wrappers pair samples like zip() and keep the original denominators."""
+
+    def test_unequal_lengths(self):
+        get = lambda s: s["v"]
+        gold = [{"v": "a"}, {"v": "b"}, {"v": "c"}]
+        self.assertAlmostEqual(validate_extraction.compute_exact_match_accuracy(gold, gold[:2], get, get), 2 / 3)
+        self.assertAlmostEqual(validate_extraction.compute_exact_match_accuracy(gold, gold[:1], get, get), 1 / 3)
+        self.assertEqual(validate_extraction.compute_exact_match_accuracy(gold, [], get, get), 0.0)
+        gold_lists = [{"v": ["1"]}, {"v": ["2"]}]
+        recall = validate_extraction.compute_list_recall(gold_lists, gold_lists[:1], get, get)
+        self.assertEqual(recall, 1.0)
+        self.assertEqual(validate_extraction.compute_list_recall(gold_lists[:1], gold_lists, get, get), 1.0)
+
+
+if __name__ == "__main__":
+    unittest.main()